@@ -1,11 +1,21 @@
 import os
 import re
-import json
+import hashlib
+import random
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
 
+import fitz  # PyMuPDF
+import httpx
+import orjson
 import pdfplumber
-from openai import OpenAI  # new-style client
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient  # new-style client
+from openai import APIConnectionError, APITimeoutError, RateLimitError
 
 # ==========================
 # CONFIG – EDIT THESE
@@ -23,38 +33,127 @@ DEFAULT_OUTPUT_FOLDER = os.path.expanduser("~/Documents/MRI_Outputs")
 # 4) Model to use with Responses API
 LLM_MODEL = "gpt-4.1-mini"
 
+# 5) Max number of LLM requests (batches) in flight at once (keep under rate limits)
+LLM_CONCURRENCY = 8
+
+# 6) Number of reports sent to the LLM in a single request
+LLM_BATCH_SIZE = 8
+
+# 7) Per-request timeout (seconds) and retries on timeouts/rate limits/connection errors.
+#    Batch requests get LLM_TIMEOUT plus LLM_BATCH_TIMEOUT_PER_ITEM per report.
+LLM_TIMEOUT = 30.0
+LLM_BATCH_TIMEOUT_PER_ITEM = 10.0
+LLM_MAX_RETRIES = 3
+
+# 8) Sections longer than this many characters are cut down to their
+#    head + tail before being sent to the LLM
+LLM_MAX_SECTION_CHARS = 8000
+LLM_SECTION_HEAD_CHARS = 6000
+LLM_SECTION_TAIL_CHARS = 2000
+
+# 9) Max number of PDFs parsed at once (bounds memory use)
+PDF_WORKERS = 4
+
+# 10) How often buffered progress messages are written to the output box (ms)
+LOG_FLUSH_MS = 100
+
+
+# ==========================
+# COMPILED PATTERNS
+# ==========================
+
+# Name label variants, most specific first; group(1) is the label. Only
+# labels are scanned, so a label can never be swallowed by the value of an
+# earlier label on the same line ("Physician Name: X    Patient Name: Y").
+# The value is read separately, from the end of the label to the end of
+# the line.
+_PATIENT_LABEL_RE = re.compile(r"(patient name|patient|name)[:\-]", re.IGNORECASE)
+_PATIENT_VALUE_RE = re.compile(r"\s*(.+)")
+_PATIENT_LABELS = ["patient name", "patient", "name"]
+_SPLIT_DOB = re.compile(r"\s{2,}|dob", re.IGNORECASE)
+
+
+# Every known section heading. The first alternative is a heading at line
+# start, optionally numbered and with punctuation (group 1); the second is
+# a keyword followed by a colon mid-line, as in "FINDINGS: ... IMPRESSION: ..."
+# (group 2), which only counts as the end of a section. Scanned once per
+# document. The keywords are ASCII, so re.ASCII restricts case-insensitive
+# matching to a plain ASCII fold instead of Unicode case folding.
+_HEADING_KEYWORDS = r"(findings|impression|conclusion|discussion|report)"
+_ALL_HEADINGS = re.compile(
+    rf"^\s*(?:\d+\s*[\.\)])?\s*{_HEADING_KEYWORDS}s?\b\s*[:\-–—.]?"
+    rf"|\b{_HEADING_KEYWORDS}s?\s*:",
+    re.MULTILINE | re.IGNORECASE | re.ASCII,
+)
+
 
 # ==========================
 # HELPER FUNCTIONS
 # ==========================
 
-def load_pdf_text(pdf_path: str) -> str:
-    """
-    Load all text from a multi-page PDF using pdfplumber.
-    Joins all pages with newlines.
-    """
+def _join_pages(
+    pages: Iterable[str],
+    max_pages: int | None,
+    early_stop_pred: Callable[[str], bool] | None,
+) -> str:
+    """Join page texts with newlines, honoring max_pages / early_stop_pred."""
     text_pages = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text() or ""
-            text_pages.append(page_text)
+    for i, page_text in enumerate(pages):
+        if max_pages is not None and i >= max_pages:
+            break
+        text_pages.append(page_text)
+        if early_stop_pred and early_stop_pred(page_text):
+            break
     return "\n".join(text_pages)
 
 
+def load_pdf_text(
+    pdf_path: str,
+    max_pages: int | None = None,
+    make_early_stop_pred: Callable[[], Callable[[str], bool]] | None = None,
+) -> str:
+    """
+    Load text from a multi-page PDF using PyMuPDF, falling back to
+    pdfplumber for files PyMuPDF cannot read.
+    Joins pages with newlines.
+
+    Pages are read one at a time. Reading stops after max_pages pages, or
+    as soon as the early-stop predicate returns True, so the rest of a long
+    report is never parsed. The predicate is called once per page, in
+    order, with that page's text only, and may keep state (see
+    findings_complete_checker); make_early_stop_pred builds a fresh one
+    for each pass, so a PyMuPDF pass that fails part-way does not leak
+    state into the pdfplumber pass.
+    """
+    try:
+        with fitz.open(pdf_path) as doc:
+            pages = (page.get_text("text") for page in doc)
+            early_stop_pred = make_early_stop_pred() if make_early_stop_pred else None
+            return _join_pages(pages, max_pages, early_stop_pred)
+    except Exception:
+        with pdfplumber.open(pdf_path) as pdf:
+            pages = (page.extract_text() or "" for page in pdf.pages)
+            early_stop_pred = make_early_stop_pred() if make_early_stop_pred else None
+            return _join_pages(pages, max_pages, early_stop_pred)
+
+
+# Lone \r -> \n, non-breaking space -> space
+_NORMALIZE_TABLE = str.maketrans({"\r": "\n", "\u00a0": " "})
+
+
 def normalize_text(text: str) -> str:
     """Normalize line endings and odd spaces."""
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
-    text = text.replace("\u00a0", " ")  # non-breaking space
-    return text
+    return text.replace("\r\n", "\n").translate(_NORMALIZE_TABLE)
 
 
 # ==========================
 # PATIENT NAME EXTRACTION
 # ==========================
 
-def extract_patient_name(text: str) -> str:
+def extract_patient_name(norm_text: str) -> str:
     """
     Best-effort extraction of patient/customer name from the report text.
+    norm_text must already have been passed through normalize_text.
 
     Looks for common patterns like:
       - 'Patient Name: John Doe'
@@ -63,20 +162,24 @@ def extract_patient_name(text: str) -> str:
 
     Returns 'Unknown' if nothing obvious is found.
     """
-    norm = normalize_text(text)
-
-    patterns = [
-        r"patient name[:\-]\s*(.+)",
-        r"patient[:\-]\s*(.+)",
-        r"name[:\-]\s*(.+)",
-    ]
-
-    for pat in patterns:
-        m = re.search(pat, norm, flags=re.IGNORECASE)
-        if m:
-            line = m.group(1).strip()
+    # Single scan: keep the first hit for each label, then try labels in
+    # priority order (a later label still counts if an earlier one is empty)
+    first_hits = {}
+    for m in _PATIENT_LABEL_RE.finditer(norm_text):
+        label = m.group(1).lower()
+        first_hits.setdefault(label, m.end())
+        if label == "patient name":
+            # "Patient Name:" also contains a plain "Name:" label
+            first_hits.setdefault("name", m.end())
+
+    for label in _PATIENT_LABELS:
+        if label not in first_hits:
+            continue
+        value = _PATIENT_VALUE_RE.match(norm_text, first_hits[label])
+        if value:
+            line = value.group(1).strip()
             # Cut off at common separators like double spaces or DOB
-            line = re.split(r"\s{2,}|dob", line, flags=re.IGNORECASE)[0].strip()
+            line = _SPLIT_DOB.split(line)[0].strip()
             # Avoid extremely long garbage
             if 0 < len(line) <= 80:
                 return line
@@ -88,65 +191,237 @@ def extract_patient_name(text: str) -> str:
 # SECTION EXTRACTION
 # ==========================
 
-def extract_section_by_heading(text: str, heading: str, stop_headings: list[str]) -> str | None:
+def extract_section_by_heading(norm_text: str, heading: str, stop_headings: list[str]) -> str | None:
     """
     Generic helper to extract a section starting at a given heading
     and ending before the next stop heading.
 
+    All headings are found in a single pass over the text; the section
+    runs from the first line-start match of `heading` to the next match
+    (at line start, or inline as "keyword:") that is one of `stop_headings`.
+
+    norm_text: report text, already passed through normalize_text
     heading: e.g. "findings", "impression"
     stop_headings: list like ["impression", "conclusion", "discussion", "report", "findings"]
 
     Returns None if the heading is not found.
     """
-    if not text:
+    if not norm_text:
         return None
 
-    norm = normalize_text(text)
-    low = norm.lower()
+    matches = list(_ALL_HEADINGS.finditer(norm_text))
 
-    # Heading at line start, optionally numbered and with punctuation
-    heading_match = re.search(
-        rf"^\s*(?:\d+\s*[\.\)])?\s*{heading}s?\b\s*[:\-–—.]?",
-        low,
-        flags=re.MULTILINE,
-    )
-    if not heading_match:
+    for i, m in enumerate(matches):
+        if m.group(1) and m.group(1).lower() == heading:
+            break
+    else:
         return None
 
-    start_idx = heading_match.end()
-    end_idx = len(norm)
+    start_idx = m.end()
+    end_idx = len(norm_text)
 
-    for kw in stop_headings:
-        m = re.search(
-            rf"\b{kw}s?\b\s*[:\-–—.]?",
-            low[start_idx:],
-        )
-        if m:
-            candidate = start_idx + m.start()
-            if candidate < end_idx:
-                end_idx = candidate
+    for nxt in matches[i + 1:]:
+        if (nxt.group(1) or nxt.group(2)).lower() in stop_headings:
+            end_idx = nxt.start()
+            break
 
-    section_text = norm[start_idx:end_idx].strip()
+    section_text = norm_text[start_idx:end_idx].strip()
     return section_text or None
 
 
-def extract_findings_section(text: str) -> str | None:
-    """Extract FINDINGS section if present."""
-    stop_headings = ["impression", "conclusion", "discussion", "report"]
-    return extract_section_by_heading(text, "findings", stop_headings)
+_FINDINGS_STOP_HEADINGS = ["impression", "conclusion", "discussion", "report"]
+_IMPRESSION_STOP_HEADINGS = ["conclusion", "discussion", "report", "findings"]
+
+
+def extract_findings_section(norm_text: str) -> str | None:
+    """Extract FINDINGS section if present (norm_text already normalized)."""
+    return extract_section_by_heading(norm_text, "findings", _FINDINGS_STOP_HEADINGS)
+
+
+def extract_impression_section(norm_text: str) -> str | None:
+    """Extract IMPRESSION section if present (norm_text already normalized)."""
+    return extract_section_by_heading(norm_text, "impression", _IMPRESSION_STOP_HEADINGS)
+
+
+def findings_complete_checker() -> Callable[[str], bool]:
+    """
+    Build an early_stop_pred for load_pdf_text. Fed one page at a time, it
+    returns True once the first FINDINGS heading has been followed by
+    non-whitespace text and then one of its stop headings, i.e. reading
+    further pages cannot change the FINDINGS section used for the summary.
+
+    If that FINDINGS section turns out empty, extraction falls back to
+    IMPRESSION (or the full report), which may run on to any later page,
+    so the checker then never stops early.
+
+    Only the new page is scanned. Pages are joined with newlines and no
+    heading spans a line break, so nothing is missed at page boundaries.
 
+    Note that everything extracted from the report, including the patient
+    name, only sees the pages read before the stop; header fields sit on
+    the first page, before FINDINGS, in practice.
+    """
+    seen_findings = False
+    has_content = False
+    findings_empty = False
+
+    def check(page_text: str) -> bool:
+        nonlocal seen_findings, has_content, findings_empty
+        if findings_empty:
+            return False
+
+        # Start of the not-yet-checked FINDINGS text on this page
+        pos = 0
+        for m in _ALL_HEADINGS.finditer(page_text):
+            if not seen_findings:
+                if m.group(1) and m.group(1).lower() == "findings":
+                    seen_findings = True
+                    pos = m.end()
+                continue
+            if (m.group(1) or m.group(2)).lower() in _FINDINGS_STOP_HEADINGS:
+                if has_content or page_text[pos:m.start()].strip():
+                    return True
+                findings_empty = True
+                return False
 
-def extract_impression_section(text: str) -> str | None:
-    """Extract IMPRESSION section if present."""
-    stop_headings = ["conclusion", "discussion", "report", "findings"]
-    return extract_section_by_heading(text, "impression", stop_headings)
+        if seen_findings and page_text[pos:].strip():
+            has_content = True
+        return False
+
+    return check
 
 
 # ==========================
-# LLM CALLS (PER REPORT)
+# LLM CALLS
 # ==========================
 
-def summarize_section_structured(client: OpenAI, section_text: str, source_label: str) -> dict:
+def _llm_cache_path(output_folder: str) -> str:
+    """Directory holding cached LLM responses, created on first use."""
+    cache_dir = os.path.join(output_folder, ".llm_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def _summary_cache_file(cache_dir: str, section_text: str, source_label: str) -> str:
+    """Cache entry path, keyed by model, source label and section text."""
+    key = hashlib.sha256(f"{LLM_MODEL}|{source_label}|{section_text}".encode()).hexdigest()
+    return os.path.join(cache_dir, key + ".json")
+
+
+def _load_cached_summary(cache_file: str) -> dict | None:
+    """
+    Return the cached summary, or None on a cache miss. Unreadable,
+    corrupt or hand-edited entries that are not a JSON object also count
+    as a miss, so they are simply summarized (and rewritten) again.
+    """
+    try:
+        with open(cache_file, "rb") as f:
+            data = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _store_cached_summary(cache_file: str, data: dict):
+    """Write to a temp file first so a crash never leaves a partial entry."""
+    tmp_file = cache_file + ".tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(orjson.dumps(data))
+    os.replace(tmp_file, cache_file)
+
+
+# JSON schemas for structured output, so the model always returns bare,
+# parseable JSON (no ```json fences, no out-of-range labels or scores)
+_SUMMARY_PROPERTIES = {
+    "summary": {"type": "string"},
+    "severity_label": {
+        "type": "string",
+        "enum": ["none/normal", "mild", "moderate", "severe", "uncertain"],
+    },
+    "severity_score": {"type": "integer", "minimum": 0, "maximum": 5},
+}
+
+_SUMMARY_FORMAT = {
+    "type": "json_schema",
+    "name": "mri_summary",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": _SUMMARY_PROPERTIES,
+        "required": ["summary", "severity_label", "severity_score"],
+        "additionalProperties": False,
+    },
+}
+
+_BATCH_SUMMARY_FORMAT = {
+    "type": "json_schema",
+    "name": "mri_summary_batch",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "items": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"id": {"type": "string"}, **_SUMMARY_PROPERTIES},
+                    "required": ["id", "summary", "severity_label", "severity_score"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["items"],
+        "additionalProperties": False,
+    },
+}
+
+
+async def _create_response(
+    client: AsyncOpenAI,
+    prompt: str,
+    text_format: dict,
+    timeout: float = LLM_TIMEOUT,
+):
+    """
+    Call the Responses API with the given structured output format,
+    retrying transient failures (timeouts, rate limits, dropped
+    connections) with jittered exponential backoff.
+    """
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            return await client.responses.create(
+                model=LLM_MODEL,
+                input=prompt,
+                text={"format": text_format},
+                timeout=timeout,
+            )
+        except (APITimeoutError, RateLimitError, APIConnectionError):
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            await asyncio.sleep(2 ** attempt + random.random())
+
+
+def _truncate_section(section_text: str) -> str:
+    """
+    Keep the head and tail of very long sections so the prompt stays small;
+    the opening and closing lines carry most of the severity information.
+    """
+    if len(section_text) <= LLM_MAX_SECTION_CHARS:
+        return section_text
+    return (
+        section_text[:LLM_SECTION_HEAD_CHARS]
+        + "\n...[truncated]...\n"
+        + section_text[-LLM_SECTION_TAIL_CHARS:]
+    )
+
+
+async def summarize_section_structured(
+    client: AsyncOpenAI,
+    section_text: str,
+    source_label: str,
+    cache_dir: str | None = None,
+    use_cache: bool = True,
+) -> dict:
     """
     Given text from either:
       - FINDINGS section
@@ -158,7 +433,18 @@ def summarize_section_structured(client: OpenAI, section_text: str, source_label
       - severity_score: integer 0–5 (0 = normal, 5 = very severe)
 
     source_label: "findings" | "impression" | "full_report"
+
+    If cache_dir is given and use_cache is set, responses are cached on disk
+    keyed by model, source label and section text, so re-running a folder
+    does not repeat the LLM call. Fallback results are never cached.
     """
+    cache_file = None
+    if cache_dir and use_cache:
+        cache_file = _summary_cache_file(cache_dir, section_text, source_label)
+        cached = _load_cached_summary(cache_file)
+        if cached is not None:
+            return cached
+
     prompt = f"""
 You are an expert radiologist.
 
@@ -198,36 +484,138 @@ Do not include treatment recommendations or future plans—only describe the ima
 
 Here is the text:
 
-\"\"\"{section_text}\"\"\"
+\"\"\"{_truncate_section(section_text)}\"\"\"
 """
 
-    # Use Responses API, no response_format kw to keep compatibility
-    resp = client.responses.create(
-        model=LLM_MODEL,
-        input=prompt,
-    )
+    # Use Responses API with a JSON schema so the output is bare JSON
+    resp = await _create_response(client, prompt, _SUMMARY_FORMAT)
 
     # Convenience: get combined text output
     raw = resp.output_text.strip()
 
-    # Strip ```json fences if present
-    if raw.startswith("```"):
-        raw = re.sub(r"^```[a-zA-Z]*", "", raw).strip()
-        if raw.endswith("```"):
-            raw = raw[:-3].strip()
-
+    # Defensive only: the schema makes unparseable output unlikely
     try:
-        data = json.loads(raw)
-    except json.JSONDecodeError:
-        data = {
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return {
             "summary": section_text[:300] + ("..." if len(section_text) > 300 else ""),
             "severity_label": "uncertain",
             "severity_score": 3,
             "raw_llm_output": raw,
         }
+
+    if cache_file:
+        _store_cached_summary(cache_file, data)
+
     return data
 
 
+async def summarize_sections_batch(
+    client: AsyncOpenAI,
+    items: list[dict],
+    cache_dir: str | None = None,
+) -> list[dict | None]:
+    """
+    Summarize several reports in one LLM request.
+
+    items: [{"id": basename, "source_label": ..., "text": ...}, ...]
+
+    The model replies with {"items": [...]} (structured output wraps the
+    list because the schema's top level must be an object).
+
+    Returns one result per item, in the same order, with the same fields
+    as summarize_section_structured. An entry is None when the model's
+    reply has no usable object for that item; callers should fall back to
+    summarize_section_structured for it. Results are written to cache_dir
+    if given, but the cache is not consulted: pass only uncached items.
+    """
+    item_blocks = "\n\n".join(
+        f"=== ITEM {item['id']} ===\n"
+        f"Source type: {item['source_label']}\n"
+        f"\"\"\"{_truncate_section(item['text'])}\"\"\""
+        for item in items
+    )
+
+    prompt = f"""
+You are an expert radiologist.
+
+You will receive {len(items)} MRI reports. Each one starts with a line
+"=== ITEM <id> ===" followed by its source type and text. The text may be:
+- the FINDINGS section,
+- the IMPRESSION section, or
+- the full report text.
+
+For EACH item, independently:
+
+1. Read the content carefully.
+2. Produce a short, clinically accurate summary (1–3 sentences) that captures
+   the key abnormal findings and overall impression of severity.
+3. Assign a severity label and numeric score:
+
+   - severity_label: one of
+       "none/normal", "mild", "moderate", "severe", "uncertain"
+   - severity_score: integer from 0 to 5
+       0 = no abnormal findings
+       1 = very mild/minimal
+       2 = mild
+       3 = moderate
+       4 = marked/severe
+       5 = very severe / critical
+
+Return ONLY a JSON object whose "items" array has one object per item, in
+the same order as the items:
+
+{{
+  "items": [
+    {{
+      "id": "<the item id>",
+      "summary": "<1-3 sentence textual summary>",
+      "severity_label": "<one of: none/normal, mild, moderate, severe, uncertain>",
+      "severity_score": <integer 0-5>
+    }}
+  ]
+}}
+
+Do not include treatment recommendations or future plans—only describe the imaging-based severity.
+
+Here are the items:
+
+{item_blocks}
+"""
+
+    # Output (and prefill) grows with the number of reports in the batch
+    timeout = LLM_TIMEOUT + LLM_BATCH_TIMEOUT_PER_ITEM * len(items)
+    resp = await _create_response(client, prompt, _BATCH_SUMMARY_FORMAT, timeout=timeout)
+
+    raw = resp.output_text.strip()
+
+    try:
+        parsed = orjson.loads(raw)["items"]
+    except (orjson.JSONDecodeError, KeyError, TypeError):
+        return [None] * len(items)
+    if not isinstance(parsed, list):
+        return [None] * len(items)
+
+    by_id = {
+        str(obj.get("id")): obj
+        for obj in parsed
+        if isinstance(obj, dict)
+    }
+
+    results = []
+    for item in items:
+        data = by_id.get(str(item["id"]))
+        if data is not None:
+            data = {k: v for k, v in data.items() if k != "id"}
+            if cache_dir:
+                _store_cached_summary(
+                    _summary_cache_file(cache_dir, item["text"], item["source_label"]),
+                    data,
+                )
+        results.append(data)
+    return results
+
+
 # ==========================
 # GUI LOGIC
 # ==========================
@@ -275,6 +663,13 @@ class MRIApp:
         root.grid_rowconfigure(3, weight=1)
         root.grid_columnconfigure(1, weight=1)
 
+        # Progress messages are buffered and inserted in one go every
+        # LOG_FLUSH_MS; many small inserts make the text widget re-layout
+        # over and over. The lock lets the event loop thread log too.
+        self._log_buffer: list[str] = []
+        self._log_lock = threading.Lock()
+        self.root.after(LOG_FLUSH_MS, self._flush_log_periodically)
+
         # OpenAI client
         if not OPENAI_API_KEY or "YOUR_OPENAI_API_KEY_HERE" in OPENAI_API_KEY:
             messagebox.showwarning(
@@ -283,7 +678,32 @@ class MRIApp:
             )
             self.client = None
         else:
-            self.client = OpenAI(api_key=OPENAI_API_KEY)
+            # Retries are handled by _create_response, not the SDK. One client
+            # (and keep-alive pool) is reused for every request of every run,
+            # so TCP/TLS handshakes are paid once rather than per report.
+            self.client = AsyncOpenAI(
+                api_key=OPENAI_API_KEY,
+                timeout=LLM_TIMEOUT,
+                max_retries=0,
+                # DefaultAsyncHttpxClient keeps the SDK's own HTTP defaults
+                # (redirects, transport settings) and only changes the pool limits
+                http_client=DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_keepalive_connections=16,
+                        max_connections=32,
+                        keepalive_expiry=60,
+                    ),
+                ),
+            )
+
+        # Background event loop for the LLM calls. It outlives individual
+        # runs so the client's connection pool stays bound to one loop.
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+        # Bounded pool for PDF text extraction, so parsing of later PDFs
+        # overlaps with the LLM calls of earlier ones
+        self.pdf_executor = ThreadPoolExecutor(max_workers=PDF_WORKERS)
 
     def browse_folder(self):
         folder_selected = filedialog.askdirectory(initialdir=self.folder_var.get())
@@ -311,111 +731,234 @@ class MRIApp:
             return
 
         # Find all PDF files
-        pdf_files = [
-            os.path.join(input_folder, f)
-            for f in os.listdir(input_folder)
-            if f.lower().endswith(".pdf")
-        ]
-        pdf_files.sort()
+        with os.scandir(input_folder) as it:
+            pdf_files = sorted(
+                e.path
+                for e in it
+                if e.is_file() and e.name.lower().endswith(".pdf")
+            )
         if not pdf_files:
             messagebox.showinfo("No PDFs", "No PDF files found in the selected folder.")
             return
 
         self.output_text.delete("1.0", tk.END)
-        self.output_text.insert(tk.END, f"Found {len(pdf_files)} PDF files.\n\n")
-        self.root.update_idletasks()
+        self._log(f"Found {len(pdf_files)} PDF files.\n\n")
+
+        self.run_button.config(state=tk.DISABLED)
+
+        threading.Thread(
+            target=self._worker,
+            args=(output_folder, pdf_files),
+            daemon=True,
+        ).start()
+
+    def _worker(self, output_folder: str, pdf_files: list[str]):
+        """
+        Runs off the Tk main thread: processes all PDFs on the event loop,
+        then writes the summary table and CSV/JSON. Talks to Tk only through
+        the log buffer and root.after.
+        """
+        try:
+            cache_dir = _llm_cache_path(output_folder)
+            future = asyncio.run_coroutine_threadsafe(self._process_all(pdf_files, cache_dir), self.loop)
+            per_report_rows = future.result()
+        except Exception as e:
+            self._log(f"\nError during aggregation: {e}\n")
+        else:
+            self._report_results(per_report_rows, output_folder)
+        finally:
+            self.root.after(0, lambda: self.run_button.config(state=tk.NORMAL))
+
+    def _log(self, message: str):
+        """Queue a message for the output box; safe to call from any thread."""
+        with self._log_lock:
+            self._log_buffer.append(message)
+
+    def _post_log(self, lines: list[str]):
+        """Queue one report's log lines as a single block."""
+        self._log("".join(lines))
+
+    def _flush_log(self):
+        """Insert all buffered messages with a single Tk call (main thread only)."""
+        with self._log_lock:
+            if not self._log_buffer:
+                return
+            text = "".join(self._log_buffer)
+            self._log_buffer.clear()
+        self.output_text.insert(tk.END, text)
+
+    def _flush_log_periodically(self):
+        self._flush_log()
+        self.root.after(LOG_FLUSH_MS, self._flush_log_periodically)
+
+    async def _process_all(self, pdf_files: list[str], cache_dir: str) -> list[dict]:
+        """
+        Process all PDFs, keeping the input order in the result.
+
+        Text is extracted concurrently. As reports come out of extraction,
+        those without a cached summary are collected into batches of
+        LLM_BATCH_SIZE, and each batch is sent as soon as it is full, so
+        LLM calls overlap with parsing of the remaining PDFs. At most
+        LLM_CONCURRENCY batches are in flight.
+        """
+        sem = asyncio.Semaphore(LLM_CONCURRENCY)
+        prepare_tasks = [asyncio.create_task(self._prepare_one(p)) for p in pdf_files]
+
+        rows = {}
+        pending = []
+        batch_tasks = []
+        for next_item in asyncio.as_completed(prepare_tasks):
+            item = await next_item
+            if item is None:
+                continue
 
-        per_report_rows = []
+            cached = _load_cached_summary(
+                _summary_cache_file(cache_dir, item["text"], item["source_label"])
+            )
+            if cached is not None:
+                rows[item["id"]] = self._complete_item(item, cached)
+                continue
 
-        for pdf_path in pdf_files:
-            basename = os.path.basename(pdf_path)
-            self.output_text.insert(tk.END, f"Processing: {basename}\n")
-            self.root.update_idletasks()
+            pending.append(item)
+            if len(pending) == LLM_BATCH_SIZE:
+                batch_tasks.append(asyncio.create_task(self._summarize_batch(pending, sem, cache_dir)))
+                pending = []
 
-            try:
-                full_text = load_pdf_text(pdf_path)
-            except Exception as e:
-                self.output_text.insert(
-                    tk.END,
-                    f"  Error reading PDF: {e}\n\n",
-                )
-                continue
+        if pending:
+            batch_tasks.append(asyncio.create_task(self._summarize_batch(pending, sem, cache_dir)))
 
-            # Extract patient/customer name
-            patient_name = extract_patient_name(full_text) or "Unknown"
+        for batch_rows in await asyncio.gather(*batch_tasks):
+            rows.update(batch_rows)
 
-            # Try FINDINGS first, then IMPRESSION, else full report
-            findings_text = extract_findings_section(full_text)
-            impression_text = extract_impression_section(full_text)
+        ids = [os.path.basename(p) for p in pdf_files]
+        return [rows[item_id] for item_id in ids if item_id in rows]
 
-            if findings_text:
-                section_text = findings_text
-                source_label = "findings"
-                self.output_text.insert(
-                    tk.END,
-                    "  Using FINDINGS section for summary + severity.\n",
-                )
-            elif impression_text:
-                section_text = impression_text
-                source_label = "impression"
-                self.output_text.insert(
-                    tk.END,
-                    "  No FINDINGS section; using IMPRESSION section.\n",
-                )
-            else:
-                section_text = full_text
-                source_label = "full_report"
-                self.output_text.insert(
-                    tk.END,
-                    "  No FINDINGS or IMPRESSION heading; using full report text.\n",
-                )
+    async def _prepare_one(self, pdf_path: str) -> dict | None:
+        """
+        Extract text, patient name and the section to summarize from one PDF.
 
-            self.root.update_idletasks()
+        Returns a batch item (see summarize_sections_batch) carrying the
+        patient name, or None if the PDF could not be read. The report's
+        log block is posted as soon as extraction is done.
+        """
+        basename = os.path.basename(pdf_path)
+        log = [f"Processing: {basename}\n"]
+
+        try:
+            full_text = await self.loop.run_in_executor(
+                self.pdf_executor,
+                functools.partial(load_pdf_text, pdf_path, make_early_stop_pred=findings_complete_checker),
+            )
+        except Exception as e:
+            log.append(f"  Error reading PDF: {e}\n\n")
+            self._post_log(log)
+            return None
+
+        # Normalize once; the extractors below all expect normalized text
+        norm_text = normalize_text(full_text)
+
+        # Extract patient/customer name
+        patient_name = extract_patient_name(norm_text) or "Unknown"
+
+        # Try FINDINGS first, then IMPRESSION, else full report; the
+        # IMPRESSION scan is only needed when there is no FINDINGS section
+        findings_text = extract_findings_section(norm_text)
+        impression_text = None if findings_text else extract_impression_section(norm_text)
+
+        if findings_text:
+            section_text = findings_text
+            source_label = "findings"
+            log.append("  Using FINDINGS section for summary + severity.\n")
+        elif impression_text:
+            section_text = impression_text
+            source_label = "impression"
+            log.append("  No FINDINGS section; using IMPRESSION section.\n")
+        else:
+            section_text = norm_text
+            source_label = "full_report"
+            log.append("  No FINDINGS or IMPRESSION heading; using full report text.\n")
+
+        log.append("\n")
+        self._post_log(log)
+
+        return {
+            "id": basename,
+            "source_label": source_label,
+            "text": section_text,
+            "patient_name": patient_name,
+        }
 
+    async def _summarize_batch(self, batch: list[dict], sem: asyncio.Semaphore, cache_dir: str) -> dict:
+        """
+        Summarize one batch of items. Items missing from the batch reply,
+        or the whole batch if the request fails (timeout after retries,
+        context window exceeded, ...), are retried one request per item.
+        Returns {item id: row} for the items that succeeded.
+        """
+        async with sem:
             try:
-                structured = summarize_section_structured(self.client, section_text, source_label)
+                results = await summarize_sections_batch(self.client, batch, cache_dir=cache_dir)
             except Exception as e:
-                self.output_text.insert(
-                    tk.END,
-                    f"  Error during LLM call: {e}\n\n",
+                self._log(f"Batch of {len(batch)} reports failed ({e}); retrying them one at a time.\n")
+                results = [None] * len(batch)
+
+        rows = {}
+        retry = []
+        for item, structured in zip(batch, results):
+            if structured is None:
+                retry.append(item)
+            else:
+                rows[item["id"]] = self._complete_item(item, structured)
+
+        for item, structured in zip(
+            retry,
+            await asyncio.gather(*(self._summarize_single(item, sem, cache_dir) for item in retry)),
+        ):
+            if structured is not None:
+                rows[item["id"]] = self._complete_item(item, structured)
+        return rows
+
+    async def _summarize_single(self, item: dict, sem: asyncio.Semaphore, cache_dir: str) -> dict | None:
+        """Summarize one item on its own; returns None (and logs) on failure."""
+        async with sem:
+            try:
+                return await summarize_section_structured(
+                    self.client, item["text"], item["source_label"], cache_dir=cache_dir
                 )
-                continue
-
-            summary = structured.get("summary", "").strip()
-            severity_label = structured.get("severity_label", "uncertain")
-            severity_score = structured.get("severity_score", 3)
-
-            per_report_rows.append(
-                {
-                    "file": basename,
-                    "patient_name": patient_name,
-                    "summary": summary,
-                    "severity_label": severity_label,
-                    "severity_score": severity_score,
-                }
-            )
-
-            self.output_text.insert(
-                tk.END,
-                f"  Done. Severity: {severity_label} (score {severity_score}).\n\n",
-            )
-            self.root.update_idletasks()
+            except Exception as e:
+                self._log(f"Error during LLM call for {item['id']}: {e}\n")
+                return None
+
+    def _complete_item(self, item: dict, structured: dict) -> dict:
+        """Turn an LLM result into a table row and log the item's severity."""
+        summary = structured.get("summary", "").strip()
+        severity_label = structured.get("severity_label", "uncertain")
+        severity_score = structured.get("severity_score", 3)
+
+        self._log(f"Done: {item['id']}. Severity: {severity_label} (score {severity_score}).\n")
+
+        return {
+            "file": item["id"],
+            "patient_name": item["patient_name"],
+            "summary": summary,
+            "severity_label": severity_label,
+            "severity_score": severity_score,
+        }
 
+    def _report_results(self, per_report_rows: list[dict], output_folder: str):
+        """Log the per-report table and save it as CSV + JSON."""
         if not per_report_rows:
-            self.output_text.insert(
-                tk.END,
-                "\nNo reports produced valid summaries.\n",
-            )
+            self._log("\nNo reports produced valid summaries.\n")
             return
 
         # ==========================
         # Display table-style summary
         # ==========================
-        self.output_text.insert(tk.END, "\nPer-report Summary (one row per PDF):\n\n")
+        table = ["\nPer-report Summary (one row per PDF):\n\n"]
 
         header = f"{'Report File':30s}  {'Customer Name':25s}  {'Severity':10s}  Summary\n"
-        self.output_text.insert(tk.END, header)
-        self.output_text.insert(tk.END, "-" * 120 + "\n")
+        table.append(header)
+        table.append("-" * 120 + "\n")
 
         for row in per_report_rows:
             file_col = row["file"][:30].ljust(30)
@@ -423,10 +966,9 @@ class MRIApp:
             sev_col = f"{row['severity_label']} ({row['severity_score']})"
             sev_col = sev_col[:10].ljust(10)
             summary_col = row["summary"].replace("\n", " ")
-            self.output_text.insert(
-                tk.END,
-                f"{file_col}  {name_col}  {sev_col}  {summary_col}\n",
-            )
+            table.append(f"{file_col}  {name_col}  {sev_col}  {summary_col}\n")
+
+        self._log("".join(table))
 
         # ==========================
         # Save CSV + JSON
@@ -439,33 +981,21 @@ class MRIApp:
             import csv
 
             with open(csv_path, "w", encoding="utf-8", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow(
-                    ["report_file", "patient_name", "severity_label", "severity_score", "summary"]
+                writer = csv.DictWriter(
+                    f,
+                    fieldnames=["file", "patient_name", "severity_label", "severity_score", "summary"],
+                    extrasaction="ignore",
                 )
-                for row in per_report_rows:
-                    writer.writerow(
-                        [
-                            row["file"],
-                            row["patient_name"],
-                            row["severity_label"],
-                            row["severity_score"],
-                            row["summary"],
-                        ]
-                    )
-
-            with open(json_path, "w", encoding="utf-8") as f:
-                json.dump(per_report_rows, f, indent=2)
-
-            self.output_text.insert(
-                tk.END,
-                f"\nSaved CSV summary to: {csv_path}\nSaved JSON summary to: {json_path}\n",
-            )
+                # Keep the historical "report_file" column name for the "file" key
+                writer.writerow({name: name for name in writer.fieldnames} | {"file": "report_file"})
+                writer.writerows(per_report_rows)
+
+            with open(json_path, "wb") as f:
+                f.write(orjson.dumps(per_report_rows))
+
+            self._log(f"\nSaved CSV summary to: {csv_path}\nSaved JSON summary to: {json_path}\n")
         except Exception as e:
-            self.output_text.insert(
-                tk.END,
-                f"\nError saving CSV/JSON: {e}\n",
-            )
+            self._log(f"\nError saving CSV/JSON: {e}\n")
 
 
 def main():
@@ -0,0 +1,258 @@
+import asyncio
+import contextlib
+import csv
+import json
+import threading
+import types
+
+import mri_aggregator_app
+from mri_aggregator_app import (
+    LLM_SECTION_HEAD_CHARS,
+    LLM_SECTION_TAIL_CHARS,
+    MRIApp,
+    _join_pages,
+    _load_cached_summary,
+    _store_cached_summary,
+    _summary_cache_file,
+    _truncate_section,
+    extract_findings_section,
+    extract_impression_section,
+    extract_patient_name,
+    findings_complete_checker,
+    load_pdf_text,
+    normalize_text,
+    summarize_sections_batch,
+)
+
+
+def test_sections_with_headings_on_their_own_lines():
+    text = normalize_text(
+        "FINDINGS:\r\nSmall effusion.\r\nNo report of fracture.\r\n\r\nIMPRESSION:\r\nMild effusion.\r\n"
+    )
+    assert extract_findings_section(text) == "Small effusion.\nNo report of fracture."
+    assert extract_impression_section(text) == "Mild effusion."
+
+
+def test_findings_stop_at_inline_impression_heading():
+    text = normalize_text("FINDINGS: Small effusion. IMPRESSION: Mild effusion.")
+    assert extract_findings_section(text) == "Small effusion."
+
+
+def test_page_reading_stops_once_findings_is_complete():
+    pages = ["Patient Name: Jane Roe", "FINDINGS:\nSmall effusion.", "IMPRESSION:\nMild.", "Appendix"]
+    text = _join_pages(iter(pages), None, findings_complete_checker())
+    assert text == "\n".join(pages[:3])
+
+
+def test_page_reading_continues_without_findings():
+    pages = ["IMPRESSION:\nMild.", "CONCLUSION:\nStable.", "Appendix"]
+    text = _join_pages(iter(pages), None, findings_complete_checker())
+    assert text == "\n".join(pages)
+
+
+def test_page_reading_continues_when_findings_is_empty():
+    pages = [
+        "FINDINGS:\nIMPRESSION:\nMild disc bulge at L4-5.",
+        "Moderate foraminal stenosis at L5-S1.\nCONCLUSION: x",
+        "Appendix",
+    ]
+    text = _join_pages(iter(pages), None, findings_complete_checker())
+    assert text == "\n".join(pages)
+    assert extract_findings_section(text) is None
+    assert extract_impression_section(text) == (
+        "Mild disc bulge at L4-5.\nModerate foraminal stenosis at L5-S1."
+    )
+
+
+def test_page_reading_waits_for_findings_text_on_a_later_page():
+    pages = ["History: pain\nFINDINGS:", "Small effusion.", "IMPRESSION:\nMild.", "Appendix"]
+    text = _join_pages(iter(pages), None, findings_complete_checker())
+    assert text == "\n".join(pages[:3])
+    assert extract_findings_section(text) == "Small effusion."
+
+
+def test_pdfplumber_fallback_gets_a_fresh_early_stop_checker(monkeypatch):
+    pages = ["REPORT: MRI knee", "FINDINGS:\nSmall effusion.", "IMPRESSION:\nMild.", "Appendix"]
+
+    def broken_fitz_pages():
+        # PyMuPDF reads the FINDINGS page, then fails
+        yield types.SimpleNamespace(get_text=lambda kind: pages[0])
+        yield types.SimpleNamespace(get_text=lambda kind: pages[1])
+        raise RuntimeError("corrupt xref")
+
+    monkeypatch.setattr(
+        mri_aggregator_app.fitz, "open", lambda path: contextlib.nullcontext(broken_fitz_pages()), raising=False
+    )
+    plumber_pdf = types.SimpleNamespace(
+        pages=[types.SimpleNamespace(extract_text=lambda p=p: p) for p in pages]
+    )
+    monkeypatch.setattr(
+        mri_aggregator_app.pdfplumber, "open", lambda path: contextlib.nullcontext(plumber_pdf), raising=False
+    )
+
+    text = load_pdf_text("report.pdf", make_early_stop_pred=findings_complete_checker)
+    assert text == "\n".join(pages[:3])
+
+
+def test_patient_name_on_its_own_line():
+    assert extract_patient_name("Patient Name: John Doe   DOB 1/1/1980\nExam: MRI Brain") == "John Doe"
+    assert extract_patient_name("Patient: Jane Roe") == "Jane Roe"
+    assert extract_patient_name("No identifying header") == "Unknown"
+
+
+def test_patient_name_wins_over_earlier_name_label_on_same_line():
+    assert extract_patient_name("Referring Physician Name: Dr. Smith    Patient Name: John Doe") == "John Doe"
+    assert extract_patient_name("Facility Name: Mercy MRI   Patient Name: Jane Roe") == "Jane Roe"
+
+
+def test_patient_label_used_when_patient_name_is_empty():
+    text = "Patient Name:   DOB: 1/2/1980  Patient: John Doe  "
+    assert extract_patient_name(text) == "John Doe"
+
+
+def test_cached_summary_round_trip(tmp_path):
+    cache_file = str(tmp_path / "entry.json")
+    data = {"summary": "Mild bulge.", "severity_label": "mild", "severity_score": 2}
+    _store_cached_summary(cache_file, data)
+    assert _load_cached_summary(cache_file) == data
+
+
+def test_bad_cache_entries_are_a_miss(tmp_path):
+    assert _load_cached_summary(str(tmp_path / "missing.json")) is None
+    for name, content in [("empty.json", b""), ("corrupt.json", b"{not json"), ("list.json", b"[1, 2]")]:
+        path = tmp_path / name
+        path.write_bytes(content)
+        assert _load_cached_summary(str(path)) is None
+
+
+def test_cache_key_depends_on_model_label_and_text(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path)
+    key = _summary_cache_file(cache_dir, "Mild bulge.", "findings")
+    assert key == _summary_cache_file(cache_dir, "Mild bulge.", "findings")
+    assert key != _summary_cache_file(cache_dir, "Mild bulge.", "impression")
+    assert key != _summary_cache_file(cache_dir, "Severe bulge.", "findings")
+    monkeypatch.setattr(mri_aggregator_app, "LLM_MODEL", "other-model")
+    assert key != _summary_cache_file(cache_dir, "Mild bulge.", "findings")
+
+
+def test_truncate_section_keeps_head_and_tail():
+    assert _truncate_section("short text") == "short text"
+    long_text = "H" * 7000 + "T" * 3000
+    truncated = _truncate_section(long_text)
+    assert truncated == "H" * LLM_SECTION_HEAD_CHARS + "\n...[truncated]...\n" + "T" * LLM_SECTION_TAIL_CHARS
+
+
+# ==========================
+# BATCHED LLM CALLS
+# ==========================
+
+class _StubResponses:
+    """Stands in for client.responses; replays canned replies in call order."""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return types.SimpleNamespace(output_text=reply)
+
+
+def _stub_client(*replies):
+    return types.SimpleNamespace(responses=_StubResponses(replies))
+
+
+def _bare_app(client):
+    """MRIApp without Tk widgets, enough for the processing methods."""
+    app = MRIApp.__new__(MRIApp)
+    app.client = client
+    app._log_buffer = []
+    app._log_lock = threading.Lock()
+    return app
+
+
+def _summary(summary, label="mild", score=2, **extra):
+    return {"summary": summary, "severity_label": label, "severity_score": score, **extra}
+
+
+_ITEMS = [
+    {"id": "a.pdf", "source_label": "findings", "text": "Disc bulge at L4-5.", "patient_name": "A"},
+    {"id": "b.pdf", "source_label": "impression", "text": "Normal study.", "patient_name": "B"},
+]
+
+
+def test_batch_reply_missing_an_item_gives_none_for_it():
+    client = _stub_client(json.dumps({"items": [dict(_summary("Bulge."), id="a.pdf")]}))
+    results = asyncio.run(summarize_sections_batch(client, _ITEMS))
+    assert results == [_summary("Bulge."), None]
+
+
+def test_batch_reply_without_items_gives_all_none():
+    for reply in ["not json", json.dumps({"summary": "x"}), json.dumps([_summary("x")])]:
+        results = asyncio.run(summarize_sections_batch(_stub_client(reply), _ITEMS))
+        assert results == [None, None]
+
+
+def test_batch_results_are_cached_under_the_key_process_all_reads(tmp_path):
+    cache_dir = str(tmp_path)
+    reply = {"items": [dict(_summary("Bulge."), id="a.pdf"), dict(_summary("Normal.", "none/normal", 0), id="b.pdf")]}
+    asyncio.run(summarize_sections_batch(_stub_client(json.dumps(reply)), _ITEMS, cache_dir=cache_dir))
+
+    for item, expected in zip(_ITEMS, [_summary("Bulge."), _summary("Normal.", "none/normal", 0)]):
+        cache_file = _summary_cache_file(cache_dir, item["text"], item["source_label"])
+        assert _load_cached_summary(cache_file) == expected
+
+
+def test_missing_batch_item_is_retried_on_its_own(tmp_path):
+    client = _stub_client(
+        json.dumps({"items": [dict(_summary("Bulge."), id="a.pdf")]}),
+        json.dumps(_summary("Normal.", "none/normal", 0)),
+    )
+    app = _bare_app(client)
+    rows = asyncio.run(app._summarize_batch(_ITEMS, asyncio.Semaphore(1), str(tmp_path)))
+
+    assert rows["a.pdf"]["summary"] == "Bulge."
+    assert rows["b.pdf"]["summary"] == "Normal."
+    assert len(client.responses.calls) == 2
+    assert "Normal study." in client.responses.calls[1]["input"]
+
+
+def test_failed_batch_request_retries_every_item(tmp_path):
+    client = _stub_client(
+        RuntimeError("context length exceeded"),
+        json.dumps(_summary("Bulge.")),
+        json.dumps(_summary("Normal.", "none/normal", 0)),
+    )
+    app = _bare_app(client)
+    rows = asyncio.run(app._summarize_batch(_ITEMS, asyncio.Semaphore(2), str(tmp_path)))
+
+    assert sorted(rows) == ["a.pdf", "b.pdf"]
+    assert len(client.responses.calls) == 3
+    assert all(call["text"]["format"]["name"] == "mri_summary" for call in client.responses.calls[1:])
+
+
+# ==========================
+# OUTPUT FILES
+# ==========================
+
+def test_csv_keeps_report_file_header(tmp_path):
+    app = _bare_app(client=None)
+    row = {
+        "file": "a.pdf",
+        "patient_name": "Jane Roe",
+        "summary": "Mild bulge, L4-5.",
+        "severity_label": "mild",
+        "severity_score": 2,
+    }
+    app._report_results([row], str(tmp_path))
+
+    with open(tmp_path / "mri_per_report_summary.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows == [
+        ["report_file", "patient_name", "severity_label", "severity_score", "summary"],
+        ["a.pdf", "Jane Roe", "mild", "2", "Mild bulge, L4-5."],
+    ]
+    assert json.loads((tmp_path / "mri_per_report_summary.json").read_text()) == [row]